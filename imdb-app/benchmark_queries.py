@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+IMDb Query-Mix Benchmark
+Replays the read workload served by server.js against loaded databases:
+- Title search on v_title_overview with LIKE filters (/api/titles/search)
+- get_recommendations_for_user stored procedure (/api/users/:id/recommendations)
+- ROW_NUMBER rating history and PERCENT_RANK percentile window queries
+- Top genres aggregation (/api/genres/top)
+Parameters are sampled from the loaded data, the mix and concurrency are
+configurable, and each database (e.g. loaded at different scales) is reported
+with p50/p95/p99 latency, QPS and EXPLAIN ANALYZE for the slowest statements.
+"""
+
+import mysql.connector
+import sys
+import copy
+import math
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+
+# Database configuration (database is chosen per run)
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'imdb_user',
+    'password': 'imdb_pass',
+    'port': 3306,
+    'autocommit': True
+}
+
+# Statements are copied verbatim from server.js so plans match production
+SEARCH_BASE = "SELECT * FROM v_title_overview WHERE 1=1"
+SEARCH_ORDER = " ORDER BY avg_user_rating DESC, user_rating_count DESC LIMIT 50"
+
+RATING_HISTORY_QUERY = """
+      SELECT
+        v.user_id,
+        v.username,
+        v.title_id,
+        v.primary_title,
+        v.rating_value,
+        v.review_text,
+        v.rated_at,
+        ROW_NUMBER() OVER (
+          PARTITION BY v.user_id
+          ORDER BY v.rated_at DESC
+        ) AS rating_rank_recent
+      FROM v_user_rating_history v
+      WHERE v.user_id = %s
+      ORDER BY v.rated_at DESC
+"""
+
+RATING_PERCENTILES_QUERY = """
+      SELECT
+        ur.user_rating_id,
+        ur.user_id,
+        ur.title_id,
+        ur.rating_value,
+        PERCENT_RANK() OVER (
+          PARTITION BY ur.title_id
+          ORDER BY ur.rating_value
+        ) AS rating_percentile
+      FROM user_rating ur
+      WHERE ur.title_id = %s
+"""
+
+TOP_GENRES_QUERY = """
+      SELECT
+        g.genre_name,
+        AVG(ur.rating_value) AS avg_rating,
+        COUNT(*) AS num_ratings
+      FROM genre_lookup g
+      JOIN title_genre tg ON tg.genre_id = g.genre_id
+      JOIN user_rating ur ON ur.title_id = tg.title_id
+      GROUP BY g.genre_name
+      HAVING COUNT(*) >= 2
+      ORDER BY avg_rating DESC
+      LIMIT 20
+"""
+
+RECOMMENDATIONS_CALL = "CALL get_recommendations_for_user(%s, %s)"
+
+# EXPLAIN cannot wrap a CALL, so the procedure body is explained instead
+RECOMMENDATIONS_BODY = """
+     SELECT
+        t.title_id,
+        t.imdb_tconst,
+        t.primary_title,
+        t.start_year,
+        t.title_type,
+        COALESCE(GROUP_CONCAT(DISTINCT g.genre_name ORDER BY g.genre_name SEPARATOR ', '), 'N/A') AS genres,
+        'Matches your favorite genres' AS reason,
+        COALESCE(t.avg_rating, 0) AS avg_rating
+     FROM title t
+     JOIN title_genre tg ON tg.title_id = t.title_id
+     LEFT JOIN genre_lookup g ON g.genre_id = tg.genre_id
+     WHERE tg.genre_id IN (
+        SELECT DISTINCT tg2.genre_id
+        FROM user_rating ur
+        JOIN title_genre tg2 ON tg2.title_id = ur.title_id
+        WHERE ur.user_id = %s AND ur.rating_value >= 8
+     )
+       AND t.title_id NOT IN (
+           SELECT title_id FROM user_rating WHERE user_id = %s
+      )
+     GROUP BY t.title_id, t.imdb_tconst, t.primary_title, t.start_year, t.title_type, t.avg_rating
+     ORDER BY COALESCE(t.avg_rating, 0) DESC, t.num_votes DESC
+     LIMIT %s
+"""
+
+# Default weights of each query in the replayed mix
+DEFAULT_MIX = {
+    'search': 40,
+    'recommendations': 20,
+    'rating_history': 15,
+    'rating_percentiles': 15,
+    'top_genres': 10,
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def parse_mix(spec):
+    """Parse 'search=40,top_genres=10' into a weight dict"""
+    mix = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown query '{name}' (choose from {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight) if weight else 1.0
+        if mix[name] < 0:
+            raise ValueError(f"Weight for '{name}' must not be negative")
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Query mix must give at least one query a positive weight")
+    return mix
+
+
+class ParameterSampler:
+    """Draws randomized request parameters from values present in the database"""
+
+    def __init__(self, cursor, rng, sample_size=5000):
+        self.rng = rng
+
+        cursor.execute("SELECT user_id FROM app_user")
+        self.user_ids = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("SELECT DISTINCT title_id FROM user_rating LIMIT %s", (sample_size,))
+        self.rated_title_ids = [row[0] for row in cursor.fetchall()]
+        if not self.rated_title_ids:
+            cursor.execute("SELECT title_id FROM title LIMIT %s", (sample_size,))
+            self.rated_title_ids = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("SELECT primary_title FROM title LIMIT %s", (sample_size,))
+        words = set()
+        for (primary_title,) in cursor.fetchall():
+            for word in (primary_title or '').lower().split():
+                word = word.strip('.,:;!?"\'()')
+                if len(word) >= 3:
+                    words.add(word)
+        self.keywords = sorted(words)
+
+        cursor.execute("SELECT genre_name FROM genre_lookup")
+        self.genres = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("SELECT DISTINCT title_type FROM title")
+        self.title_types = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("SELECT MIN(start_year), MAX(start_year) FROM title")
+        self.min_year, self.max_year = cursor.fetchone()
+
+        if not self.user_ids or not self.rated_title_ids or not self.keywords:
+            raise RuntimeError("Database has no users, titles or title words to sample; load data first")
+
+    def fork(self, rng):
+        """Share the sampled pools with a worker that has its own random stream"""
+        sampler = copy.copy(self)
+        sampler.rng = rng
+        return sampler
+
+    def search(self):
+        """Build a search request the way server.js assembles it"""
+        query = SEARCH_BASE
+        params = []
+
+        query += " AND LOWER(primary_title) LIKE %s"
+        params.append(f"%{self.rng.choice(self.keywords)}%")
+        if self.min_year is not None and self.rng.random() < 0.3:
+            year_from = self.rng.randint(self.min_year, self.max_year)
+            query += " AND start_year >= %s"
+            params.append(year_from)
+            if self.rng.random() < 0.5:
+                query += " AND start_year <= %s"
+                params.append(self.rng.randint(year_from, self.max_year))
+        if self.title_types and self.rng.random() < 0.3:
+            query += " AND title_type = %s"
+            params.append(self.rng.choice(self.title_types))
+        if self.genres and self.rng.random() < 0.3:
+            query += " AND genres LIKE %s"
+            params.append(f"%{self.rng.choice(self.genres)}%")
+
+        query += SEARCH_ORDER
+        return query, tuple(params)
+
+    def recommendations(self):
+        return RECOMMENDATIONS_CALL, (self.rng.choice(self.user_ids), self.rng.randint(1, 10))
+
+    def rating_history(self):
+        return RATING_HISTORY_QUERY, (self.rng.choice(self.user_ids),)
+
+    def rating_percentiles(self):
+        return RATING_PERCENTILES_QUERY, (self.rng.choice(self.rated_title_ids),)
+
+    def top_genres(self):
+        return TOP_GENRES_QUERY, ()
+
+
+class QueryMixBenchmark:
+    def __init__(self, database, mix=None, concurrency=4, duration=30, warmup=5,
+                 explain_top=3, seed=None):
+        self.database = database
+        self.mix = mix or dict(DEFAULT_MIX)
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.explain_top = explain_top
+        self.seed = seed
+        self.latencies = defaultdict(list)  # query name -> [seconds]
+        self.errors = defaultdict(int)      # query name -> error count
+        self.slowest = defaultdict(list)    # query name -> [(seconds, sql, params)]
+        self.lock = threading.Lock()
+
+    def connect(self):
+        return mysql.connector.connect(database=self.database, **DB_CONFIG)
+
+    def run_query(self, cursor, name, sql, params):
+        """Execute one request and fetch every row, as the API does"""
+        if name != 'recommendations':
+            cursor.execute(sql, params)
+            cursor.fetchall()
+        elif hasattr(cursor, 'nextset'):
+            # Single CALL round trip like server.js, then drain every result set
+            cursor.execute(sql, params)
+            while True:
+                if cursor.with_rows:
+                    cursor.fetchall()
+                if not cursor.nextset():
+                    break
+        else:
+            # Older drivers only read procedure result sets through multi=True
+            for result in cursor.execute(sql, params, multi=True):
+                if result.with_rows:
+                    result.fetchall()
+
+    def record(self, name, elapsed, sql, params):
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if self.explain_top <= 0:
+                return
+            slowest = self.slowest[name]
+            if len(slowest) < self.explain_top or elapsed > slowest[-1][0]:
+                slowest.append((elapsed, sql, params))
+                slowest.sort(key=lambda item: item[0], reverse=True)
+                del slowest[self.explain_top:]
+
+    def worker(self, worker_id, base_sampler, start_at, stop_at):
+        rng = random.Random(None if self.seed is None else self.seed + worker_id)
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+
+        conn = self.connect()
+        cursor = conn.cursor()
+        sampler = base_sampler.fork(rng)
+
+        try:
+            while True:
+                now = time.perf_counter()
+                if now >= stop_at:
+                    break
+                name = rng.choices(names, weights)[0]
+                sql, params = getattr(sampler, name)()
+                began = time.perf_counter()
+                try:
+                    self.run_query(cursor, name, sql, params)
+                except mysql.connector.Error as err:
+                    if began >= start_at:
+                        with self.lock:
+                            self.errors[name] += 1
+                    if err.errno in (2006, 2013):  # server gone away / lost connection
+                        cursor.close()
+                        conn.close()
+                        conn = self.connect()
+                        cursor = conn.cursor()
+                    continue
+                elapsed = time.perf_counter() - began
+                if began >= start_at:
+                    self.record(name, elapsed, sql, params)
+        finally:
+            cursor.close()
+            conn.close()
+
+    def explain(self, cursor, name, sql, params):
+        """Return EXPLAIN ANALYZE output for one recorded request"""
+        if name == 'recommendations':
+            user_id, limit = params
+            sql, params = RECOMMENDATIONS_BODY, (user_id, user_id, limit)
+        cursor.execute("EXPLAIN ANALYZE " + sql, params)
+        return "\n".join(row[0] for row in cursor.fetchall())
+
+    def run(self):
+        print(f"\n🗄️  Database: {self.database} (concurrency: {self.concurrency})")
+
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT COUNT(*) FROM title")
+            titles = cursor.fetchone()[0]
+            cursor.execute("SELECT COUNT(*) FROM user_rating")
+            ratings = cursor.fetchone()[0]
+            print(f"  • Titles: {titles:,}  • User ratings: {ratings:,}")
+
+            sampler = ParameterSampler(cursor, random.Random(self.seed))
+        finally:
+            cursor.close()
+            conn.close()
+
+        start_at = time.perf_counter() + self.warmup
+        stop_at = start_at + self.duration
+        threads = [
+            threading.Thread(target=self.worker, args=(i, sampler, start_at, stop_at))
+            for i in range(self.concurrency)
+        ]
+        print(f"  Running {self.warmup}s warmup + {self.duration}s measurement...")
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return self.report()
+
+    def report(self):
+        """Print and return per-query latency, QPS and slowest-query plans"""
+        results = {
+            'database': self.database,
+            'concurrency': self.concurrency,
+            'duration': self.duration,
+            'queries': {},
+        }
+
+        print("\n" + "="*78)
+        print(f"{'Query':<20} {'Count':>8} {'Err':>5} {'QPS':>9} "
+              f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        print("-"*78)
+
+        total = 0
+        for name in self.mix:
+            samples = sorted(self.latencies.get(name, []))
+            total += len(samples)
+            qps = len(samples) / self.duration if self.duration > 0 else 0
+            stats = {
+                'count': len(samples),
+                'errors': self.errors.get(name, 0),
+                'qps': qps,
+            }
+            for pct in PERCENTILES:
+                stats[f'p{pct}_ms'] = percentile(samples, pct) * 1000
+            results['queries'][name] = stats
+            print(f"{name:<20} {stats['count']:>8,} {stats['errors']:>5} {qps:>9.1f} "
+                  f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+
+        total_qps = total / self.duration if self.duration > 0 else 0
+        results['total_qps'] = total_qps
+        print("-"*78)
+        print(f"{'total':<20} {total:>8,} {sum(self.errors.values()):>5} {total_qps:>9.1f}")
+        print("="*78)
+
+        if self.explain_top > 0:
+            self.report_plans(results)
+
+        return results
+
+    def report_plans(self, results):
+        print(f"\n🔍 EXPLAIN ANALYZE for slowest {self.explain_top} per query:")
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            for name in self.mix:
+                plans = []
+                for elapsed, sql, params in self.slowest.get(name, []):
+                    try:
+                        plan = self.explain(cursor, name, sql, params)
+                    except mysql.connector.Error as err:
+                        plan = f"EXPLAIN ANALYZE failed: {err}"
+                    plans.append({
+                        'elapsed_ms': elapsed * 1000,
+                        'params': list(params),
+                        'plan': plan,
+                    })
+                    print(f"\n--- {name} ({elapsed * 1000:.2f} ms) params={list(params)}")
+                    print(plan)
+                results['queries'][name]['slowest'] = plans
+        finally:
+            cursor.close()
+            conn.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay the server.js query mix against loaded IMDb databases')
+    parser.add_argument('--databases', nargs='+', default=['imdb_app'],
+                        help='Databases to benchmark, e.g. one per load scale (default: imdb_app)')
+    parser.add_argument('--host', default=DB_CONFIG['host'], help='MySQL host (default: localhost)')
+    parser.add_argument('--port', type=int, default=DB_CONFIG['port'], help='MySQL port (default: 3306)')
+    parser.add_argument('--user', default=DB_CONFIG['user'], help='MySQL user (default: imdb_user)')
+    parser.add_argument('--password', default=DB_CONFIG['password'], help='MySQL password')
+    parser.add_argument('--mix', default=','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()),
+                        help='Query weights as name=weight,... (default: %(default)s)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4],
+                        help='Concurrent client connections; several values run several passes (default: 4)')
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds per pass (default: 30)')
+    parser.add_argument('--warmup', type=float, default=5, help='Unmeasured warmup seconds per pass (default: 5)')
+    parser.add_argument('--explain-top', type=int, default=3,
+                        help='EXPLAIN ANALYZE the N slowest executions per query (default: 3, 0 to skip)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible parameters')
+    parser.add_argument('--json', dest='json_path', default=None, help='Write all results to this JSON file')
+
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as err:
+        print(f"✗ {err}")
+        sys.exit(1)
+
+    DB_CONFIG.update(host=args.host, port=args.port, user=args.user, password=args.password)
+
+    print("="*60)
+    print("🚀 IMDb Query-Mix Benchmark")
+    print("="*60)
+    print("Configuration:")
+    print(f"  • Databases: {', '.join(args.databases)}")
+    print(f"  • Mix: {', '.join(f'{k}={v:g}' for k, v in mix.items())}")
+    print(f"  • Concurrency: {', '.join(str(c) for c in args.concurrency)}")
+    print(f"  • Duration: {args.duration:g}s (+{args.warmup:g}s warmup)")
+    print("="*60)
+
+    all_results = []
+    for database in args.databases:
+        for concurrency in args.concurrency:
+            benchmark = QueryMixBenchmark(
+                database,
+                mix=mix,
+                concurrency=concurrency,
+                duration=args.duration,
+                warmup=args.warmup,
+                explain_top=args.explain_top,
+                seed=args.seed,
+            )
+            try:
+                all_results.append(benchmark.run())
+            except (mysql.connector.Error, RuntimeError) as err:
+                print(f"✗ Benchmark failed for {database}: {err}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(all_results, f, indent=2, default=str)
+        print(f"\n✓ Results written to {args.json_path}")
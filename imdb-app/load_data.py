@@ -6,12 +6,16 @@ Loads comprehensive IMDb data into MySQL database with:
 - Character data from title.principals.tsv
 - Crew data from title.crew.tsv
 - Batch processing for better performance
+- Group commits with deadlock/connection retry and bad-row bisection
 - Comprehensive user ratings
 """
 
 import mysql.connector
 import os
 import sys
+import json
+import random
+from functools import partial
 from pathlib import Path
 from collections import defaultdict
 import time
@@ -28,55 +32,258 @@ DB_CONFIG = {
 
 DATA_DIR = Path('/Users/doankhoa/Documents/Fall 25/Database systems/Data')
 
-class IMDbDataLoader:
-    def __init__(self):
+# Group-commit defaults: commit when any threshold is reached
+COMMIT_ROWS = 50000
+COMMIT_BYTES = 16 * 1024 * 1024
+COMMIT_SECONDS = 10.0
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5  # seconds, doubled on every attempt
+REJECT_FILE = 'rejected_rows.jsonl'
+
+# Errors that abort the transaction or connection and are worth retrying
+TRANSIENT_ERRNOS = {
+    1205,  # ER_LOCK_WAIT_TIMEOUT
+    1213,  # ER_LOCK_DEADLOCK
+    2006,  # CR_SERVER_GONE_ERROR
+    2013,  # CR_SERVER_LOST
+    2055,  # CR_SERVER_LOST_EXTENDED
+}
+
+# Errors caused by the values of a row; batches failing with these are bisected
+ROW_ERRNOS = {
+    1048,  # ER_BAD_NULL_ERROR
+    1062,  # ER_DUP_ENTRY
+    1264,  # ER_WARN_DATA_OUT_OF_RANGE
+    1265,  # WARN_DATA_TRUNCATED
+    1292,  # ER_TRUNCATED_WRONG_VALUE
+    1366,  # ER_TRUNCATED_WRONG_VALUE_FOR_FIELD
+    1406,  # ER_DATA_TOO_LONG
+    1452,  # ER_NO_REFERENCED_ROW_2
+    3819,  # ER_CHECK_CONSTRAINT_VIOLATED
+}
+
+class TransactionPolicy:
+    """Groups writes into large transactions and recovers from failures.
+
+    Writes stay in one open transaction until the row, byte or time interval
+    is reached. Rows written since the last commit are kept so a deadlock or
+    lost connection can be rolled back and replayed after a backoff. A batch
+    that fails on row data (CHECK, oversized value, missing foreign key...)
+    is bisected under a savepoint until the bad rows are isolated; those go
+    to the reject file and the rest load. Any other error is raised.
+    """
+
+    def __init__(self, commit_rows=COMMIT_ROWS, commit_bytes=COMMIT_BYTES,
+                 commit_seconds=COMMIT_SECONDS, max_retries=MAX_RETRIES,
+                 backoff=RETRY_BACKOFF, reject_path=REJECT_FILE):
+        self.commit_rows = commit_rows
+        self.commit_bytes = commit_bytes
+        self.commit_seconds = commit_seconds
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.reject_path = Path(reject_path)
         self.conn = None
         self.cursor = None
+        self.reject_file = None
+        self.pending = []  # (query, rows) written since the last commit
+        self.pending_rows = 0
+        self.pending_bytes = 0
+        self.pending_since = None
+        self.needs_replay = False
+        self.commits = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def open(self):
+        self.conn = mysql.connector.connect(**DB_CONFIG)
+        self.cursor = self.conn.cursor()
+
+    def close(self):
+        if self.reject_file:
+            self.reject_file.close()
+            self.reject_file = None
+        if self.cursor:
+            self.cursor.close()
+            self.cursor = None
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    @staticmethod
+    def is_transient(err):
+        return err.errno in TRANSIENT_ERRNOS
+
+    @staticmethod
+    def is_row_error(err):
+        return err.errno in ROW_ERRNOS
+
+    @staticmethod
+    def row_bytes(row):
+        return sum(len(str(value)) for value in row if value is not None) + 8
+
+    def _execute_rows(self, query, rows):
+        if len(rows) == 1:
+            self.cursor.execute(query, rows[0])
+        else:
+            self.cursor.executemany(query, rows)
+
+    def _reset(self):
+        """Drop the failed transaction and reconnect if the server went away"""
+        try:
+            self.conn.rollback()
+        except mysql.connector.Error:
+            pass
+        if not self.conn.is_connected():
+            try:
+                self.cursor.close()
+            except mysql.connector.Error:
+                pass
+            self.conn.reconnect(attempts=self.max_retries, delay=1)
+            self.cursor = self.conn.cursor()
+        self.needs_replay = bool(self.pending)
+
+    def _replay(self):
+        for query, rows in self.pending:
+            self._execute_rows(query, rows)
+
+    def _with_retry(self, action):
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self.needs_replay:
+                    self._replay()
+                    self.needs_replay = False
+                return action()
+            except mysql.connector.Error as err:
+                if not self.is_transient(err) or attempt == self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) * (1 + random.random())
+                self.retries += 1
+                print(f"  ⚠ {err} - replaying {self.pending_rows:,} uncommitted rows "
+                      f"in {delay:.1f}s (retry {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                self._reset()
+
+    def _bisect(self, query, rows):
+        """Apply rows, splitting failing chunks down to the individual bad rows"""
+        good, bad = [], []
+
+        def attempt(chunk):
+            self.cursor.execute("SAVEPOINT txn_batch")
+            try:
+                self._execute_rows(query, chunk)
+                good.extend(chunk)
+            except mysql.connector.Error as err:
+                if not self.is_row_error(err):
+                    raise
+                self.cursor.execute("ROLLBACK TO SAVEPOINT txn_batch")
+                if len(chunk) == 1:
+                    bad.append((chunk[0], err))
+                    return
+                mid = len(chunk) // 2
+                attempt(chunk[:mid])
+                attempt(chunk[mid:])
+
+        attempt(rows)
+        return good, bad
+
+    def write_rejects(self, query, bad):
+        if self.reject_file is None:
+            self.reject_file = open(self.reject_path, 'a', encoding='utf-8')
+        statement = ' '.join(query.split())
+        for row, err in bad:
+            record = {'statement': statement, 'errno': err.errno, 'error': err.msg, 'row': list(row)}
+            self.reject_file.write(json.dumps(record, default=str) + '\n')
+        self.reject_file.flush()
+        self.rejected += len(bad)
+        print(f"  ⚠ Rejected {len(bad):,} row(s) ({bad[0][1]}) -> {self.reject_path}")
+
+    def write(self, query, rows):
+        """Write rows inside the current group transaction, return rows applied"""
+        rows = list(rows)
+        if not rows:
+            return 0
+        good, bad = self._with_retry(lambda: self._bisect(query, rows))
+        if bad:
+            self.write_rejects(query, bad)
+        if good:
+            self.pending.append((query, good))
+            self.pending_rows += len(good)
+            self.pending_bytes += sum(self.row_bytes(row) for row in good)
+            if self.pending_since is None:
+                self.pending_since = time.time()
+            self.maybe_commit()
+        return len(good)
+
+    def query(self, query, params=None):
+        """Run a read on the same transaction so uncommitted rows are visible"""
+        def action():
+            self.cursor.execute(query, params)
+            return self.cursor.fetchall()
+        return self._with_retry(action)
+
+    def maybe_commit(self):
+        if (self.pending_rows >= self.commit_rows
+                or self.pending_bytes >= self.commit_bytes
+                or time.time() - self.pending_since >= self.commit_seconds):
+            self.commit()
+
+    def commit(self):
+        self._with_retry(self.conn.commit)
+        if self.pending:
+            self.commits += 1
+        self.pending = []
+        self.pending_rows = 0
+        self.pending_bytes = 0
+        self.pending_since = None
+
+    def rollback(self):
+        """Abandon the open transaction, return how many rows were discarded"""
+        lost = self.pending_rows
+        try:
+            self.conn.rollback()
+        except mysql.connector.Error:
+            pass
+        self.pending = []
+        self.pending_rows = 0
+        self.pending_bytes = 0
+        self.pending_since = None
+        self.needs_replay = False
+        return lost
+
+class IMDbDataLoader:
+    def __init__(self, **policy_options):
+        self.txn = TransactionPolicy(**policy_options)
         self.title_map = {}  # tconst -> title_id
         self.person_map = {}  # nconst -> person_id
         self.genre_map = {}   # genre_name -> genre_id
-        self.batch_size = 1000  # Batch insert size
+        self.batch_size = 1000  # Rows per INSERT/UPDATE statement
         
     def connect(self):
         try:
-            self.conn = mysql.connector.connect(**DB_CONFIG)
-            self.cursor = self.conn.cursor()
+            self.txn.open()
             print("✓ Connected to MySQL")
         except mysql.connector.Error as err:
             print(f"✗ Connection failed: {err}")
             sys.exit(1)
     
     def disconnect(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+        if self.txn.conn:
+            self.txn.close()
             print("✓ Disconnected from MySQL")
     
-    def execute(self, query, params=None, commit=True):
-        try:
-            if params:
-                self.cursor.execute(query, params)
-            else:
-                self.cursor.execute(query)
-            if commit:
-                self.conn.commit()
-            return self.cursor.fetchall() if query.strip().upper().startswith('SELECT') else None
-        except mysql.connector.Error as err:
-            self.conn.rollback()
-            print(f"✗ Query error: {err}")
-            return None
+    def execute(self, query, params=None):
+        """Run a read, or a single-row write that joins the group commit.
+
+        Errors that survive the retries are raised so run() aborts the stage.
+        """
+        if query.strip().upper().startswith('SELECT'):
+            return self.txn.query(query, params)
+        self.txn.write(query, [params or ()])
+        return None
     
     def execute_batch(self, query, params_list):
-        """Execute batch insert for better performance"""
-        try:
-            self.cursor.executemany(query, params_list)
-            self.conn.commit()
-            return len(params_list)
-        except mysql.connector.Error as err:
-            self.conn.rollback()
-            print(f"✗ Batch error: {err}")
-            return 0
+        """Execute batch write in the group transaction, rejecting only bad rows"""
+        return self.txn.write(query, params_list)
     
     def load_genres(self):
         print("\n📚 Loading genres...")
@@ -88,11 +295,13 @@ class IMDbDataLoader:
             'War', 'Western'
         }
         
-        for genre in sorted(genres):
-            query = "INSERT IGNORE INTO genre_lookup (genre_name) VALUES (%s)"
-            self.execute(query, (genre,))
+        query = """
+            INSERT INTO genre_lookup (genre_name) VALUES (%s)
+            ON DUPLICATE KEY UPDATE genre_name = genre_name
+        """
+        self.execute_batch(query, [(genre,) for genre in sorted(genres)])
 
-        result = self.execute("SELECT genre_id, genre_name FROM genre_lookup", commit=False)
+        result = self.execute("SELECT genre_id, genre_name FROM genre_lookup")
         for genre_id, genre_name in result:
             self.genre_map[genre_name] = genre_id
         
@@ -132,8 +341,9 @@ class IMDbDataLoader:
                 
                 if len(batch) >= self.batch_size:
                     query = """
-                        INSERT IGNORE INTO person (imdb_nconst, primary_name, birth_year, death_year)
+                        INSERT INTO person (imdb_nconst, primary_name, birth_year, death_year)
                         VALUES (%s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE imdb_nconst = imdb_nconst
                     """
                     self.execute_batch(query, batch)
                     batch = []
@@ -145,13 +355,14 @@ class IMDbDataLoader:
         # Insert remaining batch
         if batch:
             query = """
-                INSERT IGNORE INTO person (imdb_nconst, primary_name, birth_year, death_year)
+                INSERT INTO person (imdb_nconst, primary_name, birth_year, death_year)
                 VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE imdb_nconst = imdb_nconst
             """
             self.execute_batch(query, batch)
         
         # Build person map
-        result = self.execute("SELECT person_id, imdb_nconst FROM person", commit=False)
+        result = self.execute("SELECT person_id, imdb_nconst FROM person")
         for person_id, nconst in result:
             self.person_map[nconst] = person_id
         
@@ -196,9 +407,10 @@ class IMDbDataLoader:
                 
                 if len(batch) >= self.batch_size:
                     query = """
-                        INSERT IGNORE INTO title (imdb_tconst, primary_title, start_year, title_type, 
+                        INSERT INTO title (imdb_tconst, primary_title, start_year, title_type, 
                                                   runtime_minutes, is_adult)
                         VALUES (%s, %s, %s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE imdb_tconst = imdb_tconst
                     """
                     self.execute_batch(query, batch)
                     batch = []
@@ -210,14 +422,15 @@ class IMDbDataLoader:
         # Insert remaining batch
         if batch:
             query = """
-                INSERT IGNORE INTO title (imdb_tconst, primary_title, start_year, title_type, 
+                INSERT INTO title (imdb_tconst, primary_title, start_year, title_type, 
                                           runtime_minutes, is_adult)
                 VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE imdb_tconst = imdb_tconst
             """
             self.execute_batch(query, batch)
         
         # Build title map
-        result = self.execute("SELECT title_id, imdb_tconst FROM title", commit=False)
+        result = self.execute("SELECT title_id, imdb_tconst FROM title")
         self.title_map = {tconst: title_id for title_id, tconst in result}
         
         print(f"✓ Loaded {count:,} titles")
@@ -305,7 +518,10 @@ class IMDbDataLoader:
                             count += 1
                             
                             if len(batch) >= self.batch_size:
-                                query = "INSERT IGNORE INTO title_genre (title_id, genre_id) VALUES (%s, %s)"
+                                query = """
+                                    INSERT INTO title_genre (title_id, genre_id) VALUES (%s, %s)
+                                    ON DUPLICATE KEY UPDATE genre_id = genre_id
+                                """
                                 self.execute_batch(query, batch)
                                 batch = []
                                 if count % 10000 == 0:
@@ -315,7 +531,10 @@ class IMDbDataLoader:
         
         # Insert remaining batch
         if batch:
-            query = "INSERT IGNORE INTO title_genre (title_id, genre_id) VALUES (%s, %s)"
+            query = """
+                INSERT INTO title_genre (title_id, genre_id) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE genre_id = genre_id
+            """
             self.execute_batch(query, batch)
         
         print(f"✓ Linked {count:,} title-genre relationships")
@@ -380,8 +599,9 @@ class IMDbDataLoader:
                 
                 if len(batch) >= self.batch_size:
                     query = """
-                        INSERT IGNORE INTO title_person_role (title_id, person_id, role_type, characters)
+                        INSERT INTO title_person_role (title_id, person_id, role_type, characters)
                         VALUES (%s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE role_type = role_type
                     """
                     self.execute_batch(query, batch)
                     batch = []
@@ -393,8 +613,9 @@ class IMDbDataLoader:
         # Insert remaining batch
         if batch:
             query = """
-                INSERT IGNORE INTO title_person_role (title_id, person_id, role_type, characters)
+                INSERT INTO title_person_role (title_id, person_id, role_type, characters)
                 VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE role_type = role_type
             """
             self.execute_batch(query, batch)
         
@@ -452,8 +673,9 @@ class IMDbDataLoader:
                 
                 if len(batch) >= self.batch_size:
                     query = """
-                        INSERT IGNORE INTO title_person_role (title_id, person_id, role_type, characters)
+                        INSERT INTO title_person_role (title_id, person_id, role_type, characters)
                         VALUES (%s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE role_type = role_type
                     """
                     self.execute_batch(query, batch)
                     batch = []
@@ -465,8 +687,9 @@ class IMDbDataLoader:
         # Insert remaining batch
         if batch:
             query = """
-                INSERT IGNORE INTO title_person_role (title_id, person_id, role_type, characters)
+                INSERT INTO title_person_role (title_id, person_id, role_type, characters)
                 VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE role_type = role_type
             """
             self.execute_batch(query, batch)
         
@@ -503,7 +726,7 @@ class IMDbDataLoader:
         
         all_title_ids = []
         for query in queries:
-            results = self.execute(query, commit=False)
+            results = self.execute(query)
             if results:
                 all_title_ids.extend([row[0] for row in results])
         
@@ -545,8 +768,9 @@ class IMDbDataLoader:
                 
                 if len(batch) >= self.batch_size:
                     query = """
-                        INSERT IGNORE INTO user_rating (user_id, title_id, rating_value, review_text)
+                        INSERT INTO user_rating (user_id, title_id, rating_value, review_text)
                         VALUES (%s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE rating_value = rating_value
                     """
                     self.execute_batch(query, batch)
                     batch = []
@@ -556,8 +780,9 @@ class IMDbDataLoader:
         # Insert remaining batch
         if batch:
             query = """
-                INSERT IGNORE INTO user_rating (user_id, title_id, rating_value, review_text)
+                INSERT INTO user_rating (user_id, title_id, rating_value, review_text)
                 VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE rating_value = rating_value
             """
             self.execute_batch(query, batch)
         
@@ -580,7 +805,7 @@ class IMDbDataLoader:
         ]
         
         for name, query in stats:
-            result = self.execute(query, commit=False)
+            result = self.execute(query)
             count = result[0][0] if result else 0
             print(f"  • {name:.<30} {count:>10,}")
         
@@ -593,7 +818,7 @@ class IMDbDataLoader:
             FROM title 
             GROUP BY title_type 
             ORDER BY cnt DESC
-        """, commit=False)
+        """)
         if result:
             print("\n  Titles by Type:")
             for title_type, cnt in result:
@@ -605,7 +830,7 @@ class IMDbDataLoader:
             FROM title_person_role 
             GROUP BY role_type 
             ORDER BY cnt DESC
-        """, commit=False)
+        """)
         if result:
             print("\n  Cast/Crew by Role:")
             for role_type, cnt in result:
@@ -619,7 +844,7 @@ class IMDbDataLoader:
                 MIN(rating_value) as min_rating,
                 MAX(rating_value) as max_rating
             FROM user_rating
-        """, commit=False)
+        """)
         if result and result[0][0]:
             total, avg, min_r, max_r = result[0]
             print(f"\n  User Ratings Statistics:")
@@ -639,30 +864,42 @@ class IMDbDataLoader:
         print(f"  • Titles limit: {titles_limit:,}")
         print(f"  • Cast/Crew limit: {cast_limit:,}")
         print(f"  • Batch size: {self.batch_size:,}")
+        print(f"  • Commit every: {self.txn.commit_rows:,} rows / "
+              f"{self.txn.commit_bytes / (1024 * 1024):.0f} MB / {self.txn.commit_seconds:g}s")
+        print(f"  • Reject file: {self.txn.reject_path}")
         print("="*60)
         
         start_time = time.time()
         self.connect()
         
+        stages = [
+            self.load_genres,
+            partial(self.load_people, limit=people_limit),
+            partial(self.load_titles, limit=titles_limit),
+            self.load_ratings,
+            self.load_genres_for_titles,
+            partial(self.load_cast_and_crew_from_principals, limit=cast_limit),
+            partial(self.load_crew_from_crew_file, limit=50000),
+            self.create_comprehensive_user_ratings,
+        ]
+        
         try:
-            self.load_genres()
-            self.load_people(limit=people_limit)
-            self.load_titles(limit=titles_limit)
-            self.load_ratings()
-            self.load_genres_for_titles()
-            self.load_cast_and_crew_from_principals(limit=cast_limit)
-            self.load_crew_from_crew_file(limit=50000)
-            self.create_comprehensive_user_ratings()
+            for stage in stages:
+                stage()
+                self.txn.commit()  # Each finished stage is durable on its own
             self.verify_data()
             
             elapsed = time.time() - start_time
             print(f"\n✅ Data loading completed successfully!")
             print(f"⏱️  Total time: {elapsed:.2f} seconds ({elapsed/60:.2f} minutes)")
+            print(f"   Commits: {self.txn.commits:,}  Retries: {self.txn.retries:,}  "
+                  f"Rejected rows: {self.txn.rejected:,}")
         except Exception as e:
             print(f"\n✗ Error during data loading: {e}")
             import traceback
             traceback.print_exc()
-            self.conn.rollback()
+            lost = self.txn.rollback()
+            print(f"  Rolled back {lost:,} uncommitted rows; earlier stages stay committed")
         finally:
             self.disconnect()
 
@@ -673,10 +910,26 @@ if __name__ == '__main__':
     parser.add_argument('--people', type=int, default=50000, help='Limit for people (default: 50000)')
     parser.add_argument('--titles', type=int, default=20000, help='Limit for titles (default: 20000)')
     parser.add_argument('--cast', type=int, default=200000, help='Limit for cast/crew (default: 200000)')
+    parser.add_argument('--commit-rows', type=int, default=COMMIT_ROWS,
+                        help=f'Commit after this many rows (default: {COMMIT_ROWS})')
+    parser.add_argument('--commit-bytes', type=int, default=COMMIT_BYTES,
+                        help=f'Commit after roughly this many bytes of row data (default: {COMMIT_BYTES})')
+    parser.add_argument('--commit-seconds', type=float, default=COMMIT_SECONDS,
+                        help=f'Commit after this many seconds with open writes (default: {COMMIT_SECONDS:g})')
+    parser.add_argument('--max-retries', type=int, default=MAX_RETRIES,
+                        help=f'Retries for deadlocks and lost connections (default: {MAX_RETRIES})')
+    parser.add_argument('--reject-file', default=REJECT_FILE,
+                        help=f'JSON-lines file for rows that fail to load (default: {REJECT_FILE})')
     
     args = parser.parse_args()
     
-    loader = IMDbDataLoader()
+    loader = IMDbDataLoader(
+        commit_rows=args.commit_rows,
+        commit_bytes=args.commit_bytes,
+        commit_seconds=args.commit_seconds,
+        max_retries=args.max_retries,
+        reject_path=args.reject_file
+    )
     loader.run(
         people_limit=args.people,
         titles_limit=args.titles,